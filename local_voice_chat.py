@@ -1,16 +1,23 @@
 from fastrtc import ReplyOnPause, Stream, get_stt_model, get_tts_model
-from ollama import chat
+from ollama import Client
 import os
 import sys
-import datetime
-import logging
+import queue
+import random
+import re
+import socket
 from loguru import logger
-import io
 import time
 import threading
-import signal
-import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
 import argparse
+import inspect
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from urllib.parse import urlsplit
+import numpy as np
+import atexit
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser(description='Local Voice Chat with language support')
@@ -21,397 +28,607 @@ args = parser.parse_args()
 # Set language-specific variables
 LANGUAGE = args.language.lower()
 
-# Language-specific configurations
-LANG_CONFIG = {
-    'english': {
-        'log_file': 'voice_agent.log',
-        'console_prefix': '[VOICE-AI]',
-        'startup_message': 'VOICE AGENT STARTING',
-        'loading_models_message': 'Loading STT and TTS models...',
-        'stt_success_message': 'STT model loaded successfully',
-        'tts_success_message': 'TTS model loaded successfully',
-        'error_loading_models': 'ERROR LOADING MODELS',
-        'ollama_connection_success': 'Successfully connected to Ollama. Available models',
-        'ollama_host_message': 'Using Ollama host',
-        'ollama_model_message': 'Using Ollama model',
-        'connection_attempt': 'Attempt',
-        'connection_fail': 'Failed to connect to Ollama',
-        'retry_message': 'Retrying in',
-        'connection_fail_max': 'Could not connect to Ollama after',
-        'continue_startup': 'Continuing startup anyway...',
-        'transcribing': 'Transcribing audio...',
-        'transcription_result': 'Transcribed text',
-        'processing_llm': 'PROCESSING WITH LLM',
-        'transcript': 'Transcript',
-        'llm_usage': 'Using Ollama at',
-        'llm_model': 'with model',
-        'llm_response': 'LLM RESPONSE RECEIVED',
-        'response_text': 'Response text',
-        'generating_tts': 'Generating TTS response...',
-        'first_chunk': 'First TTS chunk generated, starting audio playback',
-        'tts_complete': 'TTS RESPONSE COMPLETED',
-        'generated_chunks': 'Generated',
-        'chunks_in': 'chunks in',
-        'tts_error': 'Error during TTS generation',
-        'fallback_attempt': 'Attempting to generate a simple beep as fallback...',
-        'fallback_success': 'Fallback beep generated successfully',
-        'fallback_fail': 'Even fallback audio generation failed',
-        'echo_error': 'ERROR IN ECHO FUNCTION',
-        'voice_error': 'ERROR IN VOICE PROCESSING',
-        'creating_stream': 'Creating Stream object...',
-        'stream_success': 'Stream created successfully',
-        'stream_error': 'Error creating Stream',
-        'launching_ui': 'Launching Voice Agent UI...',
-        'ui_title': 'Voice Assistant',
-        'ui_error': 'Error launching UI',
-        'voice_recording': 'VOICE RECORDING RECEIVED',
-        'timestamp': 'Timestamp',
-        'no_chunks': 'No TTS chunks produced after',
-        'tts_timeout': 'TTS generation did not complete within',
-        'truncated': 'message may be truncated',
-        'full_message': 'processed full message',
-        'seconds': 'seconds',
-        'system_prompt': 'You are a helpful assistant in a voice conversation. Keep your responses concise and suitable for text-to-speech.',
-    },
-    'spanish': {
-        'log_file': 'voice_agent_spanish.log',
-        'console_prefix': '[VOZ-IA]',
-        'startup_message': 'AGENTE DE VOZ INICIANDO',
-        'loading_models_message': 'Cargando modelos STT y TTS...',
-        'stt_success_message': 'Modelo STT cargado correctamente',
-        'tts_success_message': 'Modelo TTS cargado correctamente',
-        'error_loading_models': 'ERROR AL CARGAR LOS MODELOS',
-        'ollama_connection_success': 'Conectado exitosamente a Ollama. Modelos disponibles',
-        'ollama_host_message': 'Usando host de Ollama',
-        'ollama_model_message': 'Usando modelo de Ollama',
-        'connection_attempt': 'Intento',
-        'connection_fail': 'Error al conectar con Ollama',
-        'retry_message': 'Reintentando en',
-        'connection_fail_max': 'No se pudo conectar a Ollama después de',
-        'continue_startup': 'Continuando con el inicio de todos modos...',
-        'transcribing': 'Transcribiendo audio...',
-        'transcription_result': 'Texto transcrito',
-        'processing_llm': 'PROCESANDO CON LLM',
-        'transcript': 'Transcripción',
-        'llm_usage': 'Usando Ollama en',
-        'llm_model': 'con modelo',
-        'llm_response': 'RESPUESTA DEL LLM RECIBIDA',
-        'response_text': 'Texto de respuesta',
-        'generating_tts': 'Generando respuesta TTS...',
-        'first_chunk': 'Primer fragmento de TTS generado, comenzando la reproducción de audio',
-        'tts_complete': 'RESPUESTA TTS COMPLETADA',
-        'generated_chunks': 'Generados',
-        'chunks_in': 'fragmentos en',
-        'tts_error': 'Error durante la generación de TTS',
-        'fallback_attempt': 'Intentando generar un pitido simple como respaldo...',
-        'fallback_success': 'Pitido de respaldo generado con éxito',
-        'fallback_fail': 'Incluso la generación de audio de respaldo falló',
-        'echo_error': 'ERROR EN LA FUNCIÓN ECHO',
-        'voice_error': 'ERROR EN EL PROCESAMIENTO DE VOZ',
-        'creating_stream': 'Creando objeto Stream...',
-        'stream_success': 'Stream creado exitosamente',
-        'stream_error': 'Error al crear Stream',
-        'launching_ui': 'Lanzando la interfaz del Agente de Voz...',
-        'ui_title': 'Asistente de Voz en Español',
-        'ui_error': 'Error al lanzar la interfaz',
-        'voice_recording': 'GRABACIÓN DE VOZ RECIBIDA',
-        'timestamp': 'Marca de tiempo',
-        'no_chunks': 'No se produjeron fragmentos de TTS después de',
-        'tts_timeout': 'La generación de TTS no se completó en',
-        'truncated': 'el mensaje puede estar truncado',
-        'full_message': 'mensaje procesado completamente',
-        'seconds': 'segundos',
-        'system_prompt': 'Eres un asistente útil en una conversación por voz. Mantén tus respuestas concisas y adecuadas para texto-a-voz. Responde siempre en español. Eres amable y servicial.',
-    }
-}
+# Language-specific strings live in lang_<language>.json next to this script
+LANG_DIR = os.path.dirname(os.path.abspath(__file__))
+
+@dataclass(frozen=True, slots=True)
+class LangStrings:
+    """User-facing strings and text-chunking thresholds for the selected language"""
+    log_file: str
+    console_prefix: str
+    startup_message: str
+    loading_models_message: str
+    stt_success_message: str
+    tts_success_message: str
+    error_loading_models: str
+    llm_connection_success: str
+    ollama_host_message: str
+    ollama_model_message: str
+    connection_attempt: str
+    connection_fail: str
+    retry_message: str
+    connection_fail_max: str
+    continue_startup: str
+    transcribing: str
+    transcription_result: str
+    processing_llm: str
+    transcript: str
+    llm_usage: str
+    llm_model: str
+    llm_response: str
+    response_text: str
+    generating_tts: str
+    first_chunk: str
+    tts_complete: str
+    generated_chunks: str
+    chunks_in: str
+    tts_error: str
+    fallback_attempt: str
+    fallback_success: str
+    echo_error: str
+    voice_error: str
+    creating_stream: str
+    stream_success: str
+    stream_error: str
+    launching_ui: str
+    ui_title: str
+    ui_error: str
+    voice_recording: str
+    no_chunks: str
+    tts_timeout: str
+    truncated: str
+    full_message: str
+    seconds: str
+    system_prompt: str
+    tts_min_chars: int
+    tts_max_chars: int
+    warmup_text: str
+    empty_transcript: str
+
+def lang_file_path(language):
+    """Return the path of the string table for a language"""
+    return os.path.join(LANG_DIR, f"lang_{language}.json")
 
 # Default to English if specified language is not supported
-if LANGUAGE not in LANG_CONFIG:
+if not os.path.exists(lang_file_path(LANGUAGE)):
     logger.warning(f"Language '{LANGUAGE}' not supported, defaulting to English")
     LANGUAGE = 'english'
 
-# Get language configuration
-lang = LANG_CONFIG[LANGUAGE]
+# Get language configuration; only the selected language is ever loaded
+with open(lang_file_path(LANGUAGE), encoding="utf-8") as f:
+    lang = LangStrings(**json.load(f))
+
+# Fixed parts of every chat request, built once per process
+_SYSTEM_MSG = ({"role": "system", "content": lang.system_prompt},)
+# Reply length budget in tokens, scaled with the length of the question
+_MIN_PREDICT = 40
+_MAX_PREDICT = 200  # Limit response length
 
 # Configure file logging first to capture everything
-log_file = lang['log_file']
+log_file = lang.log_file
 logger.remove()  # Remove default handlers
-logger.add(log_file, rotation="10 MB", level="DEBUG", 
+# enqueue=True moves writes and rotation checks onto loguru's background thread, off the audio path
+logger.add(log_file, rotation="10 MB", level="DEBUG", enqueue=True,
            format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {message}")
-
-# Configure Ollama host from environment variable if available
-# In Docker, this will be set to host.docker.internal:11434
-ollama_host = os.environ.get("OLLAMA_HOST", "localhost:11434")
-os.environ["OLLAMA_HOST"] = ollama_host
-logger.info(f"{lang['ollama_host_message']}: {ollama_host}")
+atexit.register(logger.remove)  # Drains the queued records before exit
 
 # Get model from environment variable (set by start.sh), default to granite3-dense:latest
 ollama_model = os.environ.get("OLLAMA_MODEL", "granite3-dense:latest")
-logger.info(f"{lang['ollama_model_message']}: {ollama_model}")
+logger.info(f"{lang.ollama_model_message}: {ollama_model}")
+
+# Select the LLM backend: Ollama by default, or "vllm" for any OpenAI-compatible server
+# (continuous batching when several clients talk to the agent at once).
+# OLLAMA_MODEL names the served model for both backends.
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "ollama").lower()
+if LLM_BACKEND == "vllm":
+    if not os.environ.get("VLLM_URL"):
+        logger.error("LLM_BACKEND=vllm requires VLLM_URL (e.g. http://localhost:8000)")
+        sys.exit("LLM_BACKEND=vllm requires VLLM_URL (e.g. http://localhost:8000)")
+    from openai import OpenAI  # Only needed for the vLLM backend (pip install 'local-voice-agent[vllm]')
+    llm_host = os.environ["VLLM_URL"].rstrip("/")
+    _OPENAI = OpenAI(base_url=f"{llm_host}/v1", api_key=os.environ.get("VLLM_API_KEY", "x"))
+else:
+    # Configure Ollama host from environment variable if available
+    # In Docker, this will be set to host.docker.internal:11434
+    ollama_host = os.environ.get("OLLAMA_HOST", "localhost:11434")
+    logger.info(f"{lang.ollama_host_message}: {ollama_host}")
+    
+    # Single Ollama client so every request reuses the same HTTP connection pool
+    _OLLAMA = Client(host=ollama_host)
+    llm_host = ollama_host
+logger.info(f"LLM backend: {LLM_BACKEND} ({llm_host})")
+
+# Hide WebRTC ICE "candidate" chatter from the console without lowercasing every message
+_CANDIDATE_RE = re.compile(r"candidate", re.IGNORECASE).search
 
 # Add our custom-formatted console logger with more visible formatting
 logger.add(
     sys.stdout,
-    format=f"<yellow>{lang['console_prefix']}</yellow> <green>{{time:HH:mm:ss}}</green> | <level>{{level: <8}}</level> | {{message}}",
+    format=f"<yellow>{lang.console_prefix}</yellow> <green>{{time:HH:mm:ss}}</green> | <level>{{level: <8}}</level> | {{message}}",
     level="INFO",
-    filter=lambda record: "candidate" not in record["message"].lower()
+    filter=lambda record: "event_marker" not in record["extra"] and not _CANDIDATE_RE(record["message"]),
+    enqueue=True
 )
 
+# Raw event markers go through loguru's file sink so they stay in order with the other records
+# and follow its rotation; the console filter below keeps them off stdout
+_MARKER_LOG = logger.bind(event_marker=True).opt(raw=True)
+_BORDER_LINE = "#" * 80 + "\n"
+
+@lru_cache(maxsize=64)
+def _centered_line(text):
+    """Center an event name in the 80-column marker; event names repeat every turn, so cache them"""
+    return f"{text:^80}\n"
+
 # Function to print highly visible event markers
 def log_event(event_name, details=None):
-    """Print a highly visible event marker to both console and file"""
-    border = "#" * 80
-    message = f"\n{border}\n{event_name:^80}\n"
-    if details:
-        message += f"{details:^80}\n"
-    message += f"{border}\n"
+    """Log an event to the console and write a highly visible framed marker to file"""
+    logger.info(f"{event_name} | {details}" if details else event_name)
     
-    logger.info(message)
-    # Also write raw to file to ensure visibility
-    with open(log_file, "a") as f:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        f.write(f"\n{message}{lang['timestamp']}: {timestamp}\n\n")
+    # Also write a framed marker to the file so events stand out
+    parts = ["\n", _BORDER_LINE, _centered_line(event_name), f"{time.strftime('%Y-%m-%d %H:%M:%S'):^80}\n"]
+    if details:
+        parts.append(f"{details:^80}\n")
+    parts.append(_BORDER_LINE)
+    _MARKER_LOG.info("".join(parts))
 
 # Print very visible startup message to both console and file
-log_event(lang['startup_message'], f"Version 1.0.0 - {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+log_event(lang.startup_message, f"Version 1.0.0 - {time.strftime('%Y-%m-%d %H:%M:%S')}")
 
 # Very visible debug message for script progress
-logger.info(lang['loading_models_message'])
+logger.info(lang.loading_models_message)
 
-# Test connection to Ollama
-logger.info(f"{lang['llm_usage']} {ollama_host}...")
-max_retries = 5
-retry_delay = 2
-connected = False
+def _llm_address(host):
+    """Split a host value such as 'localhost:11434' or 'http://host:port' into (host, port)"""
+    parts = urlsplit(host if "://" in host else f"//{host}")
+    if LLM_BACKEND == "vllm":
+        # The OpenAI client uses the URL as given, so a missing port is the scheme's default
+        default_port = {"https": 443, "http": 80}.get(parts.scheme, 8000)
+    else:
+        # The Ollama client fills in 11434 for a missing port unless the scheme is https
+        default_port = 443 if parts.scheme == "https" else 11434
+    return parts.hostname or "localhost", parts.port or default_port
 
-for i in range(max_retries):
-    try:
-        # Simple test to check if Ollama is accessible
-        from ollama import Client
-        client = Client(host=ollama_host)
-        models = client.list()
-        
-        # More robust handling of the models response
-        model_names = []
-        if isinstance(models, dict) and 'models' in models:
-            for model in models.get('models', []):
-                if isinstance(model, dict) and 'name' in model:
-                    model_names.append(model['name'])
-        
-        logger.info(f"✅ {lang['ollama_connection_success']}: {model_names}")
-        connected = True
-        break
-    except Exception as e:
-        logger.warning(f"❌ {lang['connection_attempt']} {i+1}/{max_retries} - {lang['connection_fail']}: {e}")
-        if i < max_retries - 1:
-            logger.info(f"{lang['retry_message']} {retry_delay} {lang['seconds']}...")
-            time.sleep(retry_delay)
+def _list_llm_models():
+    """Return the model names served by the active LLM backend"""
+    if LLM_BACKEND == "vllm":
+        return [model.id for model in _OPENAI.models.list()]
+    
+    models = _OLLAMA.list()
+    
+    # More robust handling of the models response
+    model_names = []
+    if isinstance(models, dict) and 'models' in models:
+        for model in models.get('models', []):
+            if isinstance(model, dict) and 'name' in model:
+                model_names.append(model['name'])
+    return model_names
 
-if not connected:
-    logger.error(f"❌ {lang['connection_fail_max']} {max_retries} {lang['connection_attempt']}. {lang['continue_startup']}")
-    logger.info(f"{lang['continue_startup']}")
+# Test connection to the LLM server in the background so model loading and the UI don't wait on it
+llm_connected = threading.Event()
 
-try:
-    # Try to load language-specific model if available
-    if LANGUAGE != 'english':
+def probe_llm(max_retries=6):
+    """Check that the LLM server is reachable, retrying with exponential backoff"""
+    logger.info(f"{lang.llm_usage} {llm_host}...")
+    for i in range(max_retries):
         try:
-            # Map languages to proper locale codes
-            lang_code_map = {
-                'english': 'en-us',
-                'spanish': 'es-es'
-            }
+            # Cheap TCP probe first so an unreachable server fails fast
+            socket.create_connection(_llm_address(llm_host), timeout=0.5).close()
             
-            # Get the proper language code with fallback to first 2 chars if not in map
-            lang_code = lang_code_map.get(LANGUAGE, LANGUAGE[:2])
+            # Simple test to check if the server is accessible
+            model_names = _list_llm_models()
             
-            # Attempt to load language-specific STT model if available
-            # Remove unsupported 'language' parameter
-            stt_model = get_stt_model(language=lang_code)
-            logger.info(f"✅ {lang['stt_success_message']} ({LANGUAGE}, code: {lang_code})")
-        except Exception as lang_error:
-            logger.warning(f"Could not load {LANGUAGE}-specific STT model: {lang_error}")
-            logger.info("Falling back to default STT model...")
-            # Fall back to default model
-            stt_model = get_stt_model()
-            logger.info(f"✅ {lang['stt_success_message']} (default)")
-        
-        try:
-            # Attempt to load language-specific TTS model if available
-            # Remove unsupported 'language' parameter if it causes issues
-            tts_model = get_tts_model(language=lang_code)
-            logger.info(f"✅ {lang['tts_success_message']} ({LANGUAGE}, code: {lang_code})")
-        except Exception as lang_error:
-            logger.warning(f"Could not load {LANGUAGE}-specific TTS model: {lang_error}")
-            logger.info("Falling back to default TTS model...")
-            # Fall back to default model
-            tts_model = get_tts_model()
-            logger.info(f"✅ {lang['tts_success_message']} (default)")
-    else:
-        # Load default English models
-        stt_model = get_stt_model()  # moonshine/base
-        logger.info(f"✅ {lang['stt_success_message']}")
-        
-        tts_model = get_tts_model()  # kokoro
-        logger.info(f"✅ {lang['tts_success_message']}")
+            logger.info(f"✅ {lang.llm_connection_success}: {model_names}")
+            llm_connected.set()
+            return
+        except Exception as e:
+            logger.warning(f"❌ {lang.connection_attempt} {i+1}/{max_retries} - {lang.connection_fail}: {e}")
+            if i < max_retries - 1:
+                # Exponential backoff (0.25, 0.5, 1, 2, 4 s) with a little jitter
+                retry_delay = min(0.25 * (2 ** i), 4.0) + random.uniform(0, 0.1)
+                logger.info(f"{lang.retry_message} {retry_delay:.2f} {lang.seconds}...")
+                time.sleep(retry_delay)
+    
+    logger.error(f"❌ {lang.connection_fail_max} {max_retries} {lang.connection_attempt}. {lang.continue_startup}")
+    logger.info(f"{lang.continue_startup}")
+
+probe_thread = threading.Thread(target=probe_llm, name="llm-probe", daemon=True)
+probe_thread.start()
+
+# Map languages to proper locale codes
+LANG_CODE_MAP = {
+    'english': 'en-us',
+    'spanish': 'es-es'
+}
+
+def accepts_language(loader):
+    """Check whether a model loader takes a 'language' keyword, without calling it"""
+    parameters = inspect.signature(loader).parameters.values()
+    return any(p.name == "language" or p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters)
+
+def load_model(loader, kind, success_message):
+    """Load a model for the selected language, falling back to the default model"""
+    if LANGUAGE == 'english':
+        model = loader()
+        logger.info(f"✅ {success_message}")
+        return model
+    
+    if not accepts_language(loader):
+        # Skip a language-specific attempt that could only fail with a TypeError
+        logger.info(f"{kind} loader has no language option, using default {kind} model...")
+        model = loader()
+        logger.info(f"✅ {success_message} (default)")
+        return model
+    
+    # Get the proper language code with fallback to first 2 chars if not in map
+    lang_code = LANG_CODE_MAP.get(LANGUAGE, LANGUAGE[:2])
+    try:
+        # Attempt to load language-specific model if available
+        model = loader(language=lang_code)
+        logger.info(f"✅ {success_message} ({LANGUAGE}, code: {lang_code})")
+    except Exception as lang_error:
+        logger.warning(f"Could not load {LANGUAGE}-specific {kind} model: {lang_error}")
+        logger.info(f"Falling back to default {kind} model...")
+        # Fall back to default model
+        model = loader()
+        logger.info(f"✅ {success_message} (default)")
+    return model
+
+try:
+    # STT (moonshine) and TTS (kokoro) loads are independent, so run them side by side
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-load") as loader_pool:
+        stt_future = loader_pool.submit(load_model, get_stt_model, "STT", lang.stt_success_message)
+        tts_future = loader_pool.submit(load_model, get_tts_model, "TTS", lang.tts_success_message)
+        stt_model = stt_future.result()
+        tts_model = tts_future.result()
 except Exception as e:
-    logger.exception(f"❌ {lang['error_loading_models']}: {e}")
-    with open(log_file, "a") as f:
-        f.write(f"{lang['error_loading_models']}: {e}\n")
+    logger.exception(f"❌ {lang.error_loading_models}: {e}")
+    _MARKER_LOG.error(f"{lang.error_loading_models}: {e}\n")
+
+# Long-lived worker pools so each voice turn reuses warm threads, with one worker
+# per concurrent conversation so sessions don't queue behind each other
+MAX_SESSIONS = max(1, int(os.environ.get("MAX_SESSIONS", "4")))
+_STT_POOL = ThreadPoolExecutor(max_workers=MAX_SESSIONS, thread_name_prefix="stt")
+_TTS_POOL = ThreadPoolExecutor(max_workers=MAX_SESSIONS, thread_name_prefix="tts")
+_LLM_POOL = ThreadPoolExecutor(max_workers=MAX_SESSIONS, thread_name_prefix="llm")
+
+def _shutdown_pools():
+    """Stop the worker pools without blocking interpreter exit"""
+    _STT_POOL.shutdown(wait=False, cancel_futures=True)
+    _TTS_POOL.shutdown(wait=False, cancel_futures=True)
+    _LLM_POOL.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(_shutdown_pools)
+
+def _make_beep(frequency=440, duration=0.5, sample_rate=16000):
+    """Render a half-volume sine tone as a fastrtc (sample_rate, int16 array) chunk, working in place on one buffer"""
+    wave = np.arange(int(sample_rate * duration), dtype=np.float32)
+    wave *= 2 * np.pi * frequency / sample_rate
+    np.sin(wave, out=wave)
+    wave *= 0.5 * 32767
+    samples = wave.astype(np.int16).reshape(1, -1)
+    samples.flags.writeable = False  # Shared by every fallback, so keep it read-only
+    return sample_rate, samples
+
+# Reusable float32 STT input: 30 s at ReplyOnPause's 48 kHz input rate.
+# One buffer per STT worker thread, since several sessions can transcribe at once.
+_STT_SCRATCH_SIZE = 48000 * 30
+_stt_local = threading.local()
+
+def transcribe(audio):
+    """Run STT, converting int16 PCM into the reusable scratch buffer instead of a fresh array"""
+    sample_rate, samples = audio
+    if samples.dtype == np.int16 and samples.size <= _STT_SCRATCH_SIZE:
+        buffer = getattr(_stt_local, "scratch", None)
+        if buffer is None:
+            buffer = _stt_local.scratch = np.empty(_STT_SCRATCH_SIZE, dtype=np.float32)
+        scratch = buffer[:samples.size]
+        scratch[:] = samples.reshape(-1)
+        scratch *= 1 / 32768  # Same scaling the STT model applies to int16 input
+        audio = (sample_rate, scratch.reshape(samples.shape))
+    return stt_model.stt(audio)
+
+# Fallback beep played when TTS fails: 0.5 s of a 440 Hz tone
+_FALLBACK_BEEP = _make_beep()
+
+# Marker pushed by the TTS worker once generation has finished
+_SENTINEL = object()
+
+# Pooled syntheses that timed out while running; each one holds a TTS worker until it finishes
+_stuck_tts_futures = set()
+_stuck_tts_lock = threading.Lock()
+
+def _put_until_stopped(out_queue, item, stopped):
+    """Put item on a bounded queue, giving up once stopped() says the consumer has gone away"""
+    while not stopped():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
 
 # Function to generate TTS with timeout
-def generate_tts_with_timeout(text, timeout=120):  # 120 seconds timeout
-    """Generate TTS with a timeout to prevent hanging"""
-    chunks = []
-    chunk_event = threading.Event()
-    tts_error = None
-    chunks_yielded = 0
-    generation_complete = False
+def generate_tts_with_timeout(text, timeout=120, cancelled=None):  # 120 seconds timeout
+    """Start TTS for text right away and return a generator over its chunks that gives up after timeout"""
+    # Bounded so a fast TTS model cannot run far ahead of playback
+    chunk_queue = queue.Queue(maxsize=8)
+    consumer_done = threading.Event()
+    
+    def stopped():
+        return consumer_done.is_set() or (cancelled is not None and cancelled.is_set())
     
-    def tts_worker():
-        nonlocal chunks, tts_error, generation_complete
+    def tts_worker(out_queue):
+        if stopped():
+            return  # The turn ended while this phrase was waiting for a worker
         try:
-            # Collect chunks from the generator
+            # Hand chunks to the consumer as soon as they are produced
             for chunk in tts_model.stream_tts_sync(text):
-                chunks.append(chunk)
-                chunk_event.set()  # Signal that we got at least one chunk
-            generation_complete = True
+                if not _put_until_stopped(out_queue, chunk, stopped):
+                    return
         except Exception as e:
-            tts_error = e
-            chunk_event.set()  # Signal even if there's an error
+            _put_until_stopped(out_queue, (_SENTINEL, e), stopped)  # Hand the error to the consumer
+        finally:
+            _put_until_stopped(out_queue, _SENTINEL, stopped)  # Always wake the consumer, even on error
     
-    # Start TTS generation in a separate thread
-    thread = threading.Thread(target=tts_worker)
-    thread.daemon = True
-    thread.start()
+    # Run TTS generation on the persistent TTS workers, unless hung syntheses hold all of them
+    with _stuck_tts_lock:
+        _stuck_tts_futures.difference_update([f for f in _stuck_tts_futures if f.done()])
+        pool_hung = len(_stuck_tts_futures) >= MAX_SESSIONS
+    if pool_hung:
+        threading.Thread(target=tts_worker, args=(chunk_queue,), name="tts-fallback", daemon=True).start()
+        tts_future = None
+    else:
+        tts_future = _TTS_POOL.submit(tts_worker, chunk_queue)
     
-    # Wait for the first chunk with timeout
-    start_time = time.time()
+    return _drain_tts(chunk_queue, consumer_done, tts_future, timeout)
+
+def _drain_tts(chunk_queue, consumer_done, tts_future, timeout):
+    """Yield synthesized chunks; the timeout starts when playback of this phrase starts"""
+    # Block on the queue instead of polling; the deadline is monotonic
+    deadline = time.monotonic() + timeout
     first_chunk_timeout = min(timeout, 15)  # Wait up to 15 seconds for first chunk
+    waiting_for_first = True
     
-    if not chunk_event.wait(first_chunk_timeout):
-        logger.warning(f"⚠️ {lang['no_chunks']} {first_chunk_timeout} {lang['seconds']}")
-    
-    # If we got an error, raise it
-    if tts_error:
-        raise tts_error
-    
-    # Continue yielding chunks as they become available
-    end_time = start_time + timeout
-    
-    while time.time() < end_time:
-        # Yield any new chunks that are available
-        while chunks_yielded < len(chunks):
-            yield chunks[chunks_yielded]
-            chunks_yielded += 1
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if waiting_for_first:
+                remaining = min(remaining, first_chunk_timeout)
+            
+            try:
+                item = chunk_queue.get(timeout=max(0, remaining))
+            except queue.Empty:
+                if waiting_for_first and time.monotonic() < deadline:
+                    logger.warning(f"⚠️ {lang.no_chunks} {first_chunk_timeout} {lang.seconds}")
+                    waiting_for_first = False
+                    continue
+                logger.warning(f"⚠️ {lang.tts_timeout} {timeout} {lang.seconds} - {lang.truncated}")
+                if tts_future is not None and tts_future.running():
+                    # Don't let later calls queue behind a hung synthesis
+                    with _stuck_tts_lock:
+                        _stuck_tts_futures.add(tts_future)
+                elif tts_future is not None:
+                    # Still waiting for a worker rather than hung, so just drop it
+                    tts_future.cancel()
+                break
             
-        # If thread is done and all chunks yielded, we're done
-        if generation_complete and chunks_yielded >= len(chunks):
-            logger.info(f"✅ {lang['full_message']}")
-            break
+            waiting_for_first = False
+            if item is _SENTINEL:
+                logger.info(f"✅ {lang.full_message}")
+                break
+            if isinstance(item, tuple) and item[0] is _SENTINEL:
+                # If we got an error, raise it
+                raise item[1]
             
-        # Small sleep to prevent CPU spinning
-        time.sleep(0.05)
+            yield item
+    finally:
+        # Release the TTS worker if we stop early (timeout, error or client disconnect)
+        consumer_done.set()
+
+# A phrase is handed to TTS once it is long enough and ends on one of these characters
+_TTS_FLUSH_CHARS = frozenset(".!?;,\n")
+
+def stream_llm_tokens(messages, num_predict=_MAX_PREDICT):
+    """Stream reply text from the active LLM backend, one token at a time"""
+    if LLM_BACKEND == "vllm":
+        response_stream = _OPENAI.chat.completions.create(
+            model=ollama_model,
+            messages=messages,
+            max_tokens=num_predict,
+            stream=True
+        )
+        for chunk in response_stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+        return
     
-    # Final check for any remaining chunks
-    while chunks_yielded < len(chunks):
-        yield chunks[chunks_yielded]
-        chunks_yielded += 1
+    for part in _OLLAMA.chat(model=ollama_model, messages=messages, options={"num_predict": num_predict}, stream=True):
+        yield part["message"]["content"]
+
+def stream_llm_phrases(transcript):
+    """Stream the LLM reply and yield it in phrase-sized pieces ready for TTS"""
+    buf = []
+    size = 0
+    # Short questions get short answers, so don't let the model decode up to the full budget
+    num_predict = min(_MAX_PREDICT, max(_MIN_PREDICT, 4 * len(transcript.split())))
+    # Set when the phrase ends on punctuation that may still turn out to be part of "3.14" or "8,100"
+    pending_flush = False
+    for token in stream_llm_tokens([*_SYSTEM_MSG, {"role": "user", "content": transcript}], num_predict):
+        if not token:
+            continue
+        if pending_flush:
+            pending_flush = False
+            # Only punctuation followed by whitespace ends a phrase
+            if token[:1].isspace():
+                phrase = "".join(buf).strip()
+                buf.clear()
+                size = 0
+                if phrase:
+                    yield phrase
+        buf.append(token)
+        size += len(token)
         
-    # Log warning if timed out
-    if not generation_complete:
-        logger.warning(f"⚠️ {lang['tts_timeout']} {timeout} {lang['seconds']} - {lang['truncated']}")
+        # Flush on punctuation once the phrase is long enough
+        tail = token.rstrip(" ")
+        if size >= lang.tts_min_chars and tail[-1:] in _TTS_FLUSH_CHARS:
+            if tail == token and tail[-1] != "\n":
+                # Nothing follows the punctuation yet, so decide on the next token
+                pending_flush = True
+                continue
+            phrase = "".join(buf).strip()
+            buf.clear()
+            size = 0
+            if phrase:
+                yield phrase
+        elif size >= lang.tts_max_chars:
+            # Too long without punctuation: cut at the last space so no word is split across TTS calls
+            text = "".join(buf)
+            cut = text.rstrip().rfind(" ")
+            if cut <= 0:
+                cut = len(text)
+            phrase = text[:cut].strip()
+            buf[:] = [text[cut:]]
+            size = len(buf[0])
+            if phrase:
+                yield phrase
+    
+    # Flush whatever is left once the stream ends
+    phrase = "".join(buf).strip()
+    if phrase:
+        yield phrase
+
+def speak_llm_phrases(transcript, out_queue, cancelled):
+    """Start TTS for each LLM phrase as soon as it arrives and queue (phrase, chunks) pairs in order"""
+    stopped = cancelled.is_set
+    try:
+        for phrase in stream_llm_phrases(transcript):
+            if not _put_until_stopped(out_queue, (phrase, generate_tts_with_timeout(phrase, timeout=30, cancelled=cancelled)), stopped):
+                return
+    except Exception as e:
+        _put_until_stopped(out_queue, (_SENTINEL, e), stopped)  # Hand the LLM error to the consumer
+    finally:
+        _put_until_stopped(out_queue, _SENTINEL, stopped)
+
+# Transcripts that are empty or just an interjection never reach the LLM
+_NOISE_WORDS = frozenset({"eh", "uh", "um", "mm", "mmm", "ah", "hmm", "em"})
+_TRANSCRIPT_STRIP_CHARS = " \t\n.,!?¿¡…"
 
 # Define the echo function with heavy debugging and timeout
+# fastrtc inspects the handler signature, so echo must take only the audio argument
 def echo(audio):
+    # Bind the globals used per turn to locals once so the hot path uses fast local lookups.
+    # The models themselves stay global so a failed model load does not stop the UI from starting.
+    _lang, _model, _host, _log, _log_event = lang, ollama_model, llm_host, logger.info, log_event
+    _stt_submit, _transcribe = _STT_POOL.submit, transcribe
+    _llm_submit, _speak = _LLM_POOL.submit, speak_llm_phrases
     try:
-        # Log the voice recording event with timestamp
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        log_event(f"🎤 {lang['voice_recording']}", f"{lang['timestamp']}: {timestamp}")
+        # Log the voice recording event (loguru timestamps the record)
+        _log_event(f"🎤 {_lang.voice_recording}")
         
         # Process the audio
-        logger.info(lang['transcribing'])
-        transcript = stt_model.stt(audio)
-        logger.info(f"🎤 {lang['transcription_result']}: \"{transcript}\"")
+        _log(_lang.transcribing)
+        transcript = _stt_submit(_transcribe, audio).result()
+        _log(f"🎤 {_lang.transcription_result}: \"{transcript}\"")
         
-        # Log LLM request
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        log_event(f"🔄 {lang['processing_llm']}", f"{lang['transcript']}: \"{transcript}\"")
+        # Skip the LLM and TTS entirely for silence or a lone interjection
+        stripped = transcript.strip(_TRANSCRIPT_STRIP_CHARS).lower()
+        if len(stripped) < 2 or stripped in _NOISE_WORDS:
+            _log_event(f"⏭️ {_lang.empty_transcript}")
+            return
         
-        # Get LLM response using the model from environment variable
-        logger.info(f"{lang['llm_usage']} {ollama_host} {lang['llm_model']} {ollama_model}")
-        response = chat(
-            model=ollama_model, 
-            messages=[
-                {
-                    "role": "system",
-                    "content": lang['system_prompt']
-                },
-                {"role": "user", "content": transcript}
-            ],
-            options={"num_predict": 200}  # Limit response length
-        )
-        response_text = response["message"]["content"]
+        # Log LLM request
+        _log_event(f"🔄 {_lang.processing_llm}", f"{_lang.transcript}: \"{transcript}\"")
         
-        # Log LLM response
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        log_event(f"🤖 {lang['llm_response']}", f"{lang['timestamp']}: {timestamp}")
-        logger.info(f"{lang['response_text']}: \"{response_text[:100]}{'...' if len(response_text) > 100 else ''}\"")
+        # Stream the LLM response using the model from environment variable
+        _log(f"{_lang.llm_usage} {_host} {_lang.llm_model} {_model}")
         
         # Return audio chunks with timeout protection
-        logger.info(lang['generating_tts'])
-        tts_start_time = time.time()
+        _log(_lang.generating_tts)
+        tts_start_time = time.monotonic()
         chunk_count = 0
+        response_phrases = []
         
+        # The next phrase is synthesized while the current one plays; the small queue
+        # keeps one turn from claiming every TTS worker
+        phrase_queue = queue.Queue(maxsize=1)
+        cancelled = threading.Event()
+        _llm_submit(_speak, transcript, phrase_queue, cancelled)
         try:
-            # Use our timeboxed TTS generation function
-            for audio_chunk in generate_tts_with_timeout(response_text, timeout=30):
-                chunk_count += 1
-                if chunk_count == 1:
-                    logger.info(f"🔊 {lang['first_chunk']}")
-                elif chunk_count % 5 == 0:  # Log every 5 chunks to avoid excessive logging
-                    logger.debug(f"Generated TTS chunk #{chunk_count}")
-                yield audio_chunk
-            
-            tts_time = time.time() - tts_start_time
-            log_event(f"✅ {lang['tts_complete']}", f"{lang['generated_chunks']} {chunk_count} {lang['chunks_in']} {tts_time:.2f}s")
-        except Exception as tts_err:
-            logger.exception(f"❌ {lang['tts_error']}: {tts_err}")
-            # Try a fallback response if TTS fails
-            try:
-                logger.info(lang['fallback_attempt'])
-                # Generate a simple beep sound as fallback
-                import numpy as np
-                sample_rate = 16000  # Standard sample rate
-                duration = 0.5  # half second beep
-                t = np.linspace(0, duration, int(sample_rate * duration), False)
-                beep = np.sin(2 * np.pi * 440 * t) * 0.5  # 440 Hz tone at half volume
-                beep = (beep * 32767).astype(np.int16).tobytes()
-                yield beep
-                logger.info(lang['fallback_success'])
-            except Exception as fallback_err:
-                logger.exception(f"❌ {lang['fallback_fail']}: {fallback_err}")
-        
+            while (item := phrase_queue.get()) is not _SENTINEL:
+                phrase, audio_chunks = item
+                if phrase is _SENTINEL:
+                    # LLM errors reach the outer handler instead of the TTS fallback
+                    raise audio_chunks
+                if not response_phrases:
+                    # Log LLM response
+                    _log_event(f"🤖 {_lang.llm_response}")
+                response_phrases.append(phrase)
+
+                try:
+                    # Chunks from our timeboxed TTS generation
+                    for audio_chunk in audio_chunks:
+                        chunk_count += 1
+                        if chunk_count == 1:
+                            _log(f"🔊 {_lang.first_chunk}")
+                        elif chunk_count % 5 == 0:  # Log every 5 chunks to avoid excessive logging
+                            logger.debug("Generated TTS chunk #{}", chunk_count)
+                        yield audio_chunk
+                except Exception as tts_err:
+                    logger.exception(f"❌ {_lang.tts_error}: {tts_err}")
+                    # Play the precomputed beep as a fallback response if TTS fails
+                    _log(_lang.fallback_attempt)
+                    yield _FALLBACK_BEEP
+                    _log(_lang.fallback_success)
+                    return
+        finally:
+            # Stop the LLM stream and any synthesis still queued for this turn
+            cancelled.set()
+
+        response_text = " ".join(response_phrases)
+        _log("{}: \"{}{}\"", _lang.response_text, response_text[:100], "..." if len(response_text) > 100 else "")
+
+        tts_time = time.monotonic() - tts_start_time
+        _log_event(f"✅ {_lang.tts_complete}", f"{_lang.generated_chunks} {chunk_count} {_lang.chunks_in} {tts_time:.2f}s")
+
     except Exception as e:
-        error_msg = f"❌ {lang['echo_error']}: {e}"
+        error_msg = f"❌ {_lang.echo_error}: {e}"
         logger.exception(error_msg)
-        log_event(f"❌ {lang['voice_error']}", str(e))
+        _log_event(f"❌ {_lang.voice_error}", str(e))
+
+
+def warmup_llm():
+    """Load the model on the LLM server so the first real utterance doesn't pay the cold-start cost"""
+    # get_stt_model() and get_tts_model() already run their models once while loading,
+    # so only the LLM needs warming, and only once the probe has reached the server
+    probe_thread.join()
+    if not llm_connected.is_set():
+        return
+    try:
+        # Loads the model on the LLM server and primes the system prompt
+        for _ in stream_llm_tokens([*_SYSTEM_MSG, {"role": "user", "content": lang.warmup_text}], 1):
+            pass
+        logger.info("LLM warm-up finished")
+    except Exception as e:
+        logger.warning(f"LLM warm-up failed: {e}")
 
+threading.Thread(target=warmup_llm, name="llm-warmup", daemon=True).start()
 
-logger.info(lang['creating_stream'])
+logger.info(lang.creating_stream)
 
 try:
     # Initialize the stream
     stream = Stream(ReplyOnPause(echo), modality="audio", mode="send-receive")
-    logger.info(f"✅ {lang['stream_success']}")
+    logger.info(f"✅ {lang.stream_success}")
 except Exception as e:
-    logger.exception(f"❌ {lang['stream_error']}: {e}")
+    logger.exception(f"❌ {lang.stream_error}: {e}")
     
 # Launch the UI
-logger.info(f"🚀 {lang['launching_ui']}")
+logger.info(f"🚀 {lang.launching_ui}")
 try:
     # Configure UI with language and model info
-    ui_title = f"{lang['ui_title']} (Model: {ollama_model})"
+    ui_title = f"{lang.ui_title} (Model: {ollama_model})"
     stream.ui.title = ui_title
     stream.ui.launch()
 except Exception as e:
-    logger.exception(f"❌ {lang['ui_error']}: {e}")
\ No newline at end of file
+    logger.exception(f"❌ {lang.ui_error}: {e}")
\ No newline at end of file